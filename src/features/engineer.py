@@ -1,87 +1,325 @@
+import functools
+
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit
+except ImportError:
+    # bottleneck's C moving mean stands in for the Numba kernel
+    njit = None
+    try:
+        import bottleneck  # noqa: F401
+    except ImportError as err:
+        raise ImportError(
+            "FeatureEngineer needs numba (listed in requirements.txt) or, "
+            "as a fallback, bottleneck for its rolling-mean kernel"
+        ) from err
+
+ROLLING_COLS = ['points', 'epa', 'success', 'def_epa',
+                'pts_allowed', 'turnovers', 'sacks']
+
+FEATURE_NAMES = ['pts_diff', 'epa_diff', 'success_diff', 'turnover_diff',
+                 't1_epa', 't2_epa', 't1_success', 't2_success',
+                 'def_epa_diff', 'pts_allowed_diff', 'sacks_diff', 'net_pts_diff']
+
+# Frames up to this many rows use the NumPy window view instead of the JIT kernel
+SMALL_FRAME_ROWS = 64
+
+# Row layout of the training set: float32 features plus narrow integer labels
+TRAINING_DTYPE = np.dtype(
+    [(name, 'f4') for name in FEATURE_NAMES] + [('home_win', 'u1'), ('point_diff', 'i2')]
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _make_rolling_kernel(window):
+    """Rolling-mean kernel (min_periods=1, NaN-skipping) specialised for one window
+    
+    The kernel takes rows grouped by team, with group g spanning rows
+    bounds[g]:bounds[g + 1], and restarts the window at every group start, so
+    all teams are processed in a single call.
+    
+    window is a closure constant, so Numba compiles the fill phase with a fixed
+    trip count and turns the steady-state divide into a multiply. Sums are
+    accumulated in float64 whatever the input dtype.
+    
+    Without Numba the kernel is bottleneck.move_mean over the same window.
+    """
+    if njit is None:
+        return _make_bottleneck_kernel(window)
+    
+    inv_window = 1.0 / window
+    
+    @njit(cache=True, fastmath={'reassoc', 'contract', 'arcp'})
+    def kernel(arr, bounds, out):
+        m = arr.shape[1]
+        for j in range(m):
+            for g in range(len(bounds) - 1):
+                start = bounds[g]
+                end = bounds[g + 1]
+                fill = min(start + window, end)
+                running_sum = 0.0
+                nfinite = 0
+                
+                # Window still filling: values only enter
+                for i in range(start, fill):
+                    x = arr[i, j]
+                    if np.isfinite(x):
+                        running_sum += x
+                        nfinite += 1
+                    out[i, j] = running_sum / nfinite if nfinite > 0 else np.nan
+                
+                # Full window: one value enters, one leaves
+                for i in range(fill, end):
+                    x = arr[i, j]
+                    if np.isfinite(x):
+                        running_sum += x
+                        nfinite += 1
+                    y = arr[i - window, j]
+                    if np.isfinite(y):
+                        running_sum -= y
+                        nfinite -= 1
+                    if nfinite == window:
+                        out[i, j] = running_sum * inv_window
+                    elif nfinite > 0:
+                        out[i, j] = running_sum / nfinite
+                    else:
+                        out[i, j] = np.nan
+    
+    return kernel
+
+
+def _make_bottleneck_kernel(window):
+    """Same grouped kernel interface as _make_rolling_kernel, via bottleneck.move_mean"""
+    import bottleneck as bn
+    
+    def kernel(arr, bounds, out):
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end == start:
+                continue
+            # move_mean rejects windows longer than the data; with min_count=1
+            # a window clipped to the group length gives the same means
+            out[start:end] = bn.move_mean(arr[start:end], min(window, end - start),
+                                          min_count=1, axis=0)
+    
+    return kernel
+
+
+def _rolling_means_window_view(arr, window):
+    """Rolling mean of every column of a small array via a strided window view
+    
+    Same min_periods=1, NaN-skipping semantics as the kernel, without paying
+    for JIT compilation on one-off calls.
+    """
+    if len(arr) == 0:
+        return np.empty_like(arr)
+    
+    padded = np.concatenate([np.full((window - 1, arr.shape[1]), np.nan, dtype=arr.dtype), arr])
+    windows = sliding_window_view(padded, window, axis=0)  # (n, m, window) view
+    
+    finite = np.isfinite(windows)
+    sums = np.where(finite, windows, 0.0).sum(axis=-1, dtype=np.float64)
+    counts = finite.sum(axis=-1)
+    
+    with np.errstate(invalid='ignore'):
+        return (sums / counts).astype(arr.dtype)
+
+
+def _group_bounds(keys):
+    """Start offsets of each run of equal keys, plus the total length"""
+    starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    return np.concatenate(([0], starts, [len(keys)]))
+
+
+def _matchup_features(t1, t2):
+    """Matchup features (FEATURE_NAMES order) from rolling stats (ROLLING_COLS order)
+    
+    Works on the last axis, so t1/t2 can be single 7-vectors or (n_games, 7)
+    matrices of home/away stats; the result has 12 columns in the same layout.
+    """
+    points, epa, success, def_epa, pts_allowed, turnovers, sacks = range(len(ROLLING_COLS))
+    diff = t1 - t2
+    
+    return np.stack([
+        diff[..., points],
+        diff[..., epa],
+        diff[..., success],
+        diff[..., turnovers],
+        t1[..., epa],
+        t2[..., epa],
+        t1[..., success],
+        t2[..., success],
+        diff[..., def_epa] * 2.0,
+        diff[..., pts_allowed] * 2.0,
+        diff[..., sacks] * 2.0,
+        (t1[..., points] - t1[..., pts_allowed]) - (t2[..., points] - t2[..., pts_allowed])
+    ], axis=-1)
+
 
 class FeatureEngineer:
     """Create rolling average features and matchup differentials"""
     
+    FEATURE_COLS = FEATURE_NAMES
+    
     def __init__(self, window_size=5):
         self.window_size = window_size
+        self._rolling_cols = ROLLING_COLS
+        self._rolling_feature_names = [f'{col}_rolling_{window_size}' for col in self._rolling_cols]
+        self._kernel = _make_rolling_kernel(window_size)
     
     def create_rolling_features(self, team_stats):
         """Calculate rolling averages for recent performance"""
         
-        # Sort by week
-        team_stats = team_stats.sort_values('week')
+        # Week order, applied only to the numeric (float32) block the kernel reads
+        order = np.argsort(team_stats['week'].to_numpy(), kind='stable')
+        arr = team_stats[self._rolling_cols].to_numpy(dtype=np.float32)[order]
         
-        # Rolling statistics
-        rolling_cols = ['points', 'epa', 'success', 'def_epa', 
-                       'pts_allowed', 'turnovers', 'sacks']
+        # One pass over all columns instead of a pandas rolling per column
+        if len(arr) <= SMALL_FRAME_ROWS:
+            out = _rolling_means_window_view(arr, self.window_size)
+        else:
+            out = np.empty_like(arr)
+            self._kernel(arr, np.array([0, len(arr)]), out)
         
-        for col in rolling_cols:
-            team_stats[f'{col}_rolling_{self.window_size}'] = (
-                team_stats[col]
-                .rolling(window=self.window_size, min_periods=1)
-                .mean()
-            )
+        team_stats = team_stats.iloc[order].assign(**{
+            name: out[:, j] for j, name in enumerate(self._rolling_feature_names)
+        })
         
         return team_stats
     
+    def stack_team_stats(self, all_team_stats):
+        """Stack a {team: stats} dict into one team-indexed frame, sorted by team then week"""
+        
+        # The team moves into the index, so a 'team' column would only duplicate
+        # it and make 'team' ambiguous for sort_values/groupby on the result
+        stats = pd.concat(all_team_stats, names=['team', None]).droplevel(1)
+        stats = stats.drop(columns='team', errors='ignore')
+        order = np.lexsort((stats['week'].to_numpy(), stats.index.to_numpy()))
+        
+        return stats.iloc[order]
+    
+    def create_rolling_features_all(self, all_team_stats):
+        """Calculate rolling averages for every team in one kernel call
+        
+        Returns a single team-indexed frame sorted by team then week; use
+        .loc[[team]] for one team's stats (a frame even for a single row).
+        """
+        
+        full = self.stack_team_stats(all_team_stats)
+        bounds = _group_bounds(full.index.to_numpy())
+        
+        arr = full[self._rolling_cols].to_numpy(dtype=np.float32)
+        out = np.empty_like(arr)
+        self._kernel(arr, bounds, out)
+        
+        # Rolling outputs also land as one block for the matchup lookups
+        rolling = pd.DataFrame(out, index=full.index, columns=self._rolling_feature_names)
+        
+        return pd.concat([full, rolling], axis=1)
+    
     def create_matchup_features(self, team1_stats, team2_stats):
-        """Create differential features between two teams"""
-        
-        # Get most recent stats (last row)
-        t1 = team1_stats.iloc[-1]
-        t2 = team2_stats.iloc[-1]
-        
-        window = self.window_size
-        
-        features = {
-            'pts_diff': t1[f'points_rolling_{window}'] - t2[f'points_rolling_{window}'],
-            'epa_diff': t1[f'epa_rolling_{window}'] - t2[f'epa_rolling_{window}'],
-            'success_diff': t1[f'success_rolling_{window}'] - t2[f'success_rolling_{window}'],
-            'turnover_diff': t1[f'turnovers_rolling_{window}'] - t2[f'turnovers_rolling_{window}'],
-            't1_epa': t1[f'epa_rolling_{window}'],
-            't2_epa': t2[f'epa_rolling_{window}'],
-            't1_success': t1[f'success_rolling_{window}'],
-            't2_success': t2[f'success_rolling_{window}'],
-            'def_epa_diff': (t1[f'def_epa_rolling_{window}'] - t2[f'def_epa_rolling_{window}']) * 2.0,
-            'pts_allowed_diff': (t1[f'pts_allowed_rolling_{window}'] - t2[f'pts_allowed_rolling_{window}']) * 2.0,
-            'sacks_diff': (t1[f'sacks_rolling_{window}'] - t2[f'sacks_rolling_{window}']) * 2.0,
-            'net_pts_diff': (t1[f'points_rolling_{window}'] - t1[f'pts_allowed_rolling_{window}']) - 
-                           (t2[f'points_rolling_{window}'] - t2[f'pts_allowed_rolling_{window}'])
+        """Create differential features between two teams as a dict"""
+        
+        # Most recent rolling stats (last row) as ROLLING_COLS-ordered vectors
+        v1 = team1_stats[self._rolling_feature_names].to_numpy(dtype=np.float32)[-1]
+        v2 = team2_stats[self._rolling_feature_names].to_numpy(dtype=np.float32)[-1]
+        
+        features = dict(zip(FEATURE_NAMES, _matchup_features(v1, v2)))
+        
+        return features
+    
+    def create_matchup_features_df(self, team1_stats, team2_stats):
+        """Create differential features between two teams as a one-row DataFrame"""
+        
+        features = self.create_matchup_features(team1_stats, team2_stats)
+        
+        return pd.DataFrame([features], columns=FEATURE_NAMES, dtype=np.float32)
+    
+    def _build_team_lookup(self, team_stats):
+        """Per-team (sorted weeks, row offset) into the team/week-ordered feature matrix"""
+        
+        teams = team_stats.index.to_numpy()
+        weeks = team_stats['week'].to_numpy()
+        bounds = _group_bounds(teams)
+        
+        team_lookup = {
+            teams[start]: (weeks[start:end], start)
+            for start, end in zip(bounds[:-1], bounds[1:])
         }
         
-        return pd.DataFrame([features])
+        return team_lookup, team_stats[self._rolling_feature_names].to_numpy(dtype=np.float32, copy=False)
     
-    def prepare_training_data(self, all_team_stats, schedules):
-        """Create training dataset from historical matchups"""
+    def prepare_training_data(self, team_stats, schedules):
+        """Create training dataset from historical matchups
+        
+        team_stats is the team-indexed frame from
+        create_rolling_features_all, or a {team: rolling stats} dict.
+        """
         
-        training_data = []
+        if isinstance(team_stats, dict):
+            team_stats = self.stack_team_stats(team_stats)
+        
+        team_lookup, feature_arr = self._build_team_lookup(team_stats)
         
         # Filter completed games
-        completed = schedules[schedules['game_type'] == 'REG'].copy()
+        completed = schedules[schedules['game_type'] == 'REG'].dropna(
+            subset=['home_score', 'away_score']
+        )
+        
+        # Integer team codes so per-game lookups index lists, not dicts
+        teams = pd.CategoricalDtype(
+            pd.unique(np.concatenate([completed['home_team'], completed['away_team']]))
+        )
+        completed = completed.assign(
+            home_team=completed['home_team'].astype(teams).cat.codes,
+            away_team=completed['away_team'].astype(teams).cat.codes,
+        )
+        no_games = (np.empty(0, dtype=team_stats['week'].dtype), 0)
+        lookup_by_code = [team_lookup.get(team, no_games) for team in teams.categories]
         
-        for idx, game in completed.iterrows():
-            home_team = game['home_team']
-            away_team = game['away_team']
-            week = game['week']
+        # Labels for every game at once; the loop only decides which games to keep
+        home_score = completed['home_score'].to_numpy()
+        away_score = completed['away_score'].to_numpy()
+        labels_home_win = (home_score > away_score).astype(TRAINING_DTYPE['home_win'])
+        labels_point_diff = (home_score - away_score).astype(TRAINING_DTYPE['point_diff'])
+        
+        # Rows of feature_arr holding each game's pre-game home/away stats
+        home_rows = np.zeros(len(completed), dtype=np.intp)
+        away_rows = np.zeros(len(completed), dtype=np.intp)
+        keep_mask = np.zeros(len(completed), dtype=bool)
+        
+        completed_tuples = completed[
+            ['home_team', 'away_team', 'week']
+        ].itertuples(index=False, name=None)
+        
+        for i, (home_team, away_team, week) in enumerate(completed_tuples):
+            home_weeks, home_start = lookup_by_code[home_team]
+            away_weeks, away_start = lookup_by_code[away_team]
             
-            # Get team stats up to this game
-            home_stats = all_team_stats[home_team][
-                all_team_stats[home_team]['week'] < week
-            ]
-            away_stats = all_team_stats[away_team][
-                all_team_stats[away_team]['week'] < week
-            ]
+            # Index of the last row played before this game (binary search, no mask)
+            home_idx = np.searchsorted(home_weeks, week, side='left') - 1
+            away_idx = np.searchsorted(away_weeks, week, side='left') - 1
             
-            if len(home_stats) < 3 or len(away_stats) < 3:
+            # Need at least 3 prior games per team
+            if home_idx < 2 or away_idx < 2:
                 continue
             
-            # Create features
-            features = self.create_matchup_features(home_stats, away_stats)
-            features['home_win'] = 1 if game['home_score'] > game['away_score'] else 0
-            features['point_diff'] = game['home_score'] - game['away_score']
-            
-            training_data.append(features)
+            home_rows[i] = home_start + home_idx
+            away_rows[i] = away_start + away_idx
+            keep_mask[i] = True
+        
+        # All games' features as one (n_games, 12) matrix expression
+        feats = _matchup_features(feature_arr[home_rows[keep_mask]],
+                                  feature_arr[away_rows[keep_mask]])
+        
+        recs = np.empty(len(feats), dtype=TRAINING_DTYPE)
+        for j, name in enumerate(FEATURE_NAMES):
+            recs[name] = feats[:, j]
+        recs['home_win'] = labels_home_win[keep_mask]
+        recs['point_diff'] = labels_point_diff[keep_mask]
+        
+        training_df = pd.DataFrame.from_records(recs)
         
-        return pd.concat(training_data, ignore_index=True)
+        return training_df
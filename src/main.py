@@ -1,10 +1,72 @@
 from src.data.fetch_data import NFLDataFetcher
 from src.features.engineer import FeatureEngineer
 from src.models.train import SuperBowlPredictor
+import inspect
+import joblib
 import json
+import os
+import pandas as pd
+
+CACHE_DIR = 'cache'
+
+
+def _team_plays(pbp, team):
+    """Every pbp row of the games team played in
+    
+    Filtering on game membership rather than posteam/defteam keeps rows with
+    no possession team (end of quarter, timeouts, two-minute warnings), so
+    this is a superset of anything a per-team stat can read.
+    """
+    
+    return pbp[(pbp['home_team'] == team) | (pbp['away_team'] == team)]
+
+
+def _compute_team(fetcher, team, schedules, pbp):
+    """Season stats for one team (joblib worker)"""
+    
+    return fetcher.get_team_season_stats(team, schedules, pbp)
+
+
+def load_team_stats(fetcher, engineer, schedules, pbp, season):
+    """Rolling stats for every team as one team-indexed frame,
+    memoized on disk per season, window, input data and stats code"""
+    
+    # Re-fetched/corrected data (any pbp value, e.g. re-published epa) or
+    # edits to the stats code change the key; row hashing is ~0.1 s per season
+    cache_key = joblib.hash((
+        schedules[['game_id', 'home_score', 'away_score']],
+        list(pbp.columns),
+        pd.util.hash_pandas_object(pbp, index=False).to_numpy(),
+        inspect.getsource(type(fetcher)),
+        inspect.getsource(inspect.getmodule(engineer)),
+    ))
+    cache_path = os.path.join(
+        CACHE_DIR, f'rolling_stats_{season}_w{engineer.window_size}_{cache_key[:16]}.pkl'
+    )
+    if os.path.exists(cache_path):
+        return joblib.load(cache_path)
+    
+    # Teams are independent, so spread them over all cores. loky pickles the
+    # arguments of every task, so each one gets its team's games rather than
+    # all of pbp (fetcher is pickled too; any frames it holds still travel)
+    all_teams = schedules['home_team'].unique()
+    results = joblib.Parallel(n_jobs=-1, backend='loky', batch_size=4)(
+        joblib.delayed(_compute_team)(fetcher, team, schedules, _team_plays(pbp, team))
+        for team in all_teams
+    )
+    
+    # Rolling features for all teams in one fused pass
+    team_stats = engineer.create_rolling_features_all(dict(zip(all_teams, results)))
+    
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    joblib.dump(team_stats, cache_path, compress=3)
+    
+    return team_stats
+
 
 def main():
     # Configuration
+    SEASON = 2024
     ROLLING_WINDOW = 5  # Can be made interactive
     TEAM_1 = "SEA"  # Seahawks
     TEAM_2 = "NE"   # Patriots
@@ -15,40 +77,29 @@ def main():
     
     # Step 1: Fetch data
     print("\n[1/5] Fetching NFL data...")
-    fetcher = NFLDataFetcher(2024)
+    fetcher = NFLDataFetcher(SEASON)
     pbp, schedules, weekly = fetcher.fetch_season_data()
     
-    # Step 2: Calculate team statistics
+    # Step 2: Calculate team statistics (rolling features included, cached on disk)
     print("\n[2/5] Calculating team statistics...")
-    sea_stats = fetcher.get_team_season_stats(TEAM_1, schedules, pbp)
-    ne_stats = fetcher.get_team_season_stats(TEAM_2, schedules, pbp)
+    engineer = FeatureEngineer(window_size=ROLLING_WINDOW)
+    team_stats = load_team_stats(fetcher, engineer, schedules, pbp, SEASON)
     
     # Step 3: Feature engineering
     print(f"\n[3/5] Engineering features (rolling window={ROLLING_WINDOW})...")
-    engineer = FeatureEngineer(window_size=ROLLING_WINDOW)
-    
-    sea_stats = engineer.create_rolling_features(sea_stats)
-    ne_stats = engineer.create_rolling_features(ne_stats)
+    sea_stats = team_stats.loc[[TEAM_1]]
+    ne_stats = team_stats.loc[[TEAM_2]]
     
     # Create Super Bowl matchup features
-    sb_features = engineer.create_matchup_features(sea_stats, ne_stats)
+    sb_features = engineer.create_matchup_features_df(sea_stats, ne_stats)
     
     # Step 4: Train models
     print("\n[4/5] Training models...")
     
     # Prepare training data from regular season
-    all_teams = schedules['home_team'].unique()
-    all_team_stats = {}
-    
-    for team in all_teams:
-        stats = fetcher.get_team_season_stats(team, schedules, pbp)
-        stats = engineer.create_rolling_features(stats)
-        all_team_stats[team] = stats
-    
-    training_df = engineer.prepare_training_data(all_team_stats, schedules)
+    training_df = engineer.prepare_training_data(team_stats, schedules)
     
-    feature_cols = [col for col in training_df.columns 
-                   if col not in ['home_win', 'point_diff']]
+    feature_cols = engineer.FEATURE_COLS
     
     X = training_df[feature_cols]
     y_win = training_df['home_win']
@@ -0,0 +1,226 @@
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features import engineer
+from src.features.engineer import (
+    FeatureEngineer,
+    ROLLING_COLS,
+    SMALL_FRAME_ROWS,
+    _make_bottleneck_kernel,
+    _make_rolling_kernel,
+    _rolling_means_window_view,
+)
+
+# Group sizes covering groups shorter than, equal to and longer than the windows
+GROUP_SIZES = [2, 5, 1, 23, 4, 70]
+WINDOWS = [1, 2, 5, 8]
+
+
+def _grouped_input(seed=0):
+    """float32 (rows, 3) array with NaN runs, split into GROUP_SIZES groups"""
+    rng = np.random.default_rng(seed)
+    arr = rng.normal(20, 5, size=(sum(GROUP_SIZES), 3)).astype(np.float32)
+    arr[[0, 3, 4, 10, 11, 12, 13, 14, 15], 1] = np.nan  # leading, boundary and all-NaN windows
+    arr[::7, 2] = np.nan
+    bounds = np.concatenate(([0], np.cumsum(GROUP_SIZES)))
+    return arr, bounds
+
+
+def _pandas_rolling(arr, bounds, window):
+    """Reference: pd.Series.rolling(window, min_periods=1).mean() per group and column"""
+    out = np.empty(arr.shape, dtype=np.float64)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        for j in range(arr.shape[1]):
+            out[start:end, j] = (
+                pd.Series(arr[start:end, j], dtype=np.float64)
+                .rolling(window, min_periods=1)
+                .mean()
+                .to_numpy()
+            )
+    return out
+
+
+def _kernel_factories():
+    factories = []
+    if engineer.njit is not None:
+        factories.append(pytest.param(_make_rolling_kernel, id='numba'))
+    if importlib.util.find_spec('bottleneck') is not None:
+        factories.append(pytest.param(_make_bottleneck_kernel, id='bottleneck'))
+    return factories
+
+
+@pytest.mark.parametrize('make_kernel', _kernel_factories())
+@pytest.mark.parametrize('window', WINDOWS)
+def test_grouped_kernel_matches_pandas(make_kernel, window):
+    arr, bounds = _grouped_input()
+    out = np.empty_like(arr)
+    make_kernel(window)(arr, bounds, out)
+
+    np.testing.assert_allclose(out, _pandas_rolling(arr, bounds, window),
+                               rtol=1e-5, atol=1e-5, equal_nan=True)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_window_view_matches_pandas(window):
+    arr, bounds = _grouped_input()
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        out = _rolling_means_window_view(arr[start:end], window)
+        np.testing.assert_allclose(out, _pandas_rolling(arr[start:end], [0, end - start], window),
+                                   rtol=1e-5, atol=1e-5, equal_nan=True)
+
+
+def _team_stats(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    stats = pd.DataFrame({
+        'week': rng.permutation(n_rows) + 1,
+        **{col: rng.normal(20, 5, n_rows) for col in ROLLING_COLS},
+    })
+    stats.loc[stats.index[1:4], 'epa'] = np.nan
+    return stats
+
+
+def _expected_rolling(stats, window):
+    ordered = stats.sort_values('week')
+    return np.column_stack([
+        ordered[col].rolling(window, min_periods=1).mean().to_numpy() for col in ROLLING_COLS
+    ])
+
+
+@pytest.mark.parametrize('n_rows', [3, SMALL_FRAME_ROWS, SMALL_FRAME_ROWS + 30])
+@pytest.mark.parametrize('window', WINDOWS)
+def test_create_rolling_features_small_and_large_frames(n_rows, window):
+    fe = FeatureEngineer(window_size=window)
+    stats = _team_stats(n_rows, seed=n_rows)
+
+    result = fe.create_rolling_features(stats)
+
+    assert result['week'].is_monotonic_increasing
+    np.testing.assert_allclose(result[fe._rolling_feature_names].to_numpy(np.float64),
+                               _expected_rolling(stats, window),
+                               rtol=1e-5, atol=1e-5, equal_nan=True)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_create_rolling_features_all_matches_per_team(window):
+    fe = FeatureEngineer(window_size=window)
+    all_team_stats = {f'T{i}': _team_stats(size, seed=i) for i, size in enumerate(GROUP_SIZES)}
+
+    result = fe.create_rolling_features_all(all_team_stats)
+
+    for team, stats in all_team_stats.items():
+        team_result = result.loc[[team]]
+        assert team_result['week'].is_monotonic_increasing
+        np.testing.assert_allclose(team_result[fe._rolling_feature_names].to_numpy(np.float64),
+                                   _expected_rolling(stats, window),
+                                   rtol=1e-5, atol=1e-5, equal_nan=True)
+
+
+def _rolling_row(fe, base):
+    """One week of rolling stats with a distinct value per ROLLING_COLS entry"""
+    return dict(zip(fe._rolling_feature_names, base + np.arange(len(ROLLING_COLS), dtype=float)))
+
+
+def _baseline_features(t1, t2, fe):
+    """Matchup features written out as the original dict-based implementation"""
+    w = fe.window_size
+    return {
+        'pts_diff': t1[f'points_rolling_{w}'] - t2[f'points_rolling_{w}'],
+        'epa_diff': t1[f'epa_rolling_{w}'] - t2[f'epa_rolling_{w}'],
+        'success_diff': t1[f'success_rolling_{w}'] - t2[f'success_rolling_{w}'],
+        'turnover_diff': t1[f'turnovers_rolling_{w}'] - t2[f'turnovers_rolling_{w}'],
+        't1_epa': t1[f'epa_rolling_{w}'],
+        't2_epa': t2[f'epa_rolling_{w}'],
+        't1_success': t1[f'success_rolling_{w}'],
+        't2_success': t2[f'success_rolling_{w}'],
+        'def_epa_diff': (t1[f'def_epa_rolling_{w}'] - t2[f'def_epa_rolling_{w}']) * 2.0,
+        'pts_allowed_diff': (t1[f'pts_allowed_rolling_{w}'] - t2[f'pts_allowed_rolling_{w}']) * 2.0,
+        'sacks_diff': (t1[f'sacks_rolling_{w}'] - t2[f'sacks_rolling_{w}']) * 2.0,
+        'net_pts_diff': (t1[f'points_rolling_{w}'] - t1[f'pts_allowed_rolling_{w}']) -
+                        (t2[f'points_rolling_{w}'] - t2[f'pts_allowed_rolling_{w}']),
+    }
+
+
+def _hand_built_season(fe):
+    """Rolling stats for A/B (weeks 1-5) and C (weeks 1-2); D has no stats"""
+    team_stats = {}
+    for team, base, weeks in [('A', 10.0, range(1, 6)), ('B', 30.0, range(1, 6)), ('C', 50.0, range(1, 3))]:
+        rows = [{'week': week, **_rolling_row(fe, base + 100 * week)} for week in weeks]
+        team_stats[team] = pd.DataFrame(rows[::-1])  # unsorted on purpose
+    return team_stats
+
+
+def test_create_matchup_features_layout():
+    fe = FeatureEngineer(window_size=5)
+    t1 = pd.DataFrame([_rolling_row(fe, 0.0), _rolling_row(fe, 3.0)])
+    t2 = pd.DataFrame([_rolling_row(fe, 1.0), _rolling_row(fe, 0.5)])
+    t1['points_rolling_5'] = [0.0, 21.0]
+    t2['sacks_rolling_5'] = [0.0, 1.25]
+
+    features = fe.create_matchup_features(t1, t2)
+
+    expected = _baseline_features(t1.iloc[-1], t2.iloc[-1], fe)
+    assert list(features) == list(fe.FEATURE_COLS) == list(expected)
+    np.testing.assert_allclose([features[name] for name in expected],
+                               list(expected.values()), rtol=1e-6)
+
+    df = fe.create_matchup_features_df(t1, t2)
+    assert list(df.columns) == list(expected) and len(df) == 1
+
+
+def test_prepare_training_data_matches_baseline_semantics():
+    fe = FeatureEngineer(window_size=5)
+    team_stats = _hand_built_season(fe)
+    schedules = pd.DataFrame(
+        [
+            ('REG', 3, 'A', 'B', 20, 10),        # only 2 prior games each: skipped
+            ('REG', 4, 'A', 'B', 27, 24),        # kept, uses week-3 rows
+            ('REG', 5, 'B', 'A', 13, 17),        # kept, home loss
+            ('REG', 5, 'A', 'C', 30, 0),         # C has 2 prior games: skipped
+            ('REG', 5, 'B', 'D', 21, 7),         # D has no stats: skipped
+            ('REG', 6, 'A', 'B', np.nan, np.nan),  # not played: dropped
+            ('POST', 6, 'A', 'B', 35, 3),        # not regular season
+        ],
+        columns=['game_type', 'week', 'home_team', 'away_team', 'home_score', 'away_score'],
+    )
+
+    training_df = fe.prepare_training_data(team_stats, schedules)
+
+    def week_row(team, week):
+        stats = team_stats[team]
+        return stats[stats['week'] == week].iloc[0]
+
+    expected = pd.DataFrame([
+        _baseline_features(week_row('A', 3), week_row('B', 3), fe),
+        _baseline_features(week_row('B', 4), week_row('A', 4), fe),
+    ])
+    assert list(training_df.columns) == list(fe.FEATURE_COLS) + ['home_win', 'point_diff']
+    np.testing.assert_allclose(training_df[fe.FEATURE_COLS].to_numpy(np.float64),
+                               expected.to_numpy(np.float64), rtol=1e-6)
+
+    assert training_df['home_win'].tolist() == [1, 0]
+    assert training_df['point_diff'].tolist() == [3, -4]
+    assert (training_df[fe.FEATURE_COLS].dtypes == np.float32).all()
+    assert training_df['home_win'].dtype == np.uint8
+    assert training_df['point_diff'].dtype == np.int16
+
+    # The stacked frame from create_rolling_features_all gives the same rows
+    stacked = fe.stack_team_stats(team_stats)
+    pd.testing.assert_frame_equal(fe.prepare_training_data(stacked, schedules), training_df)
+
+
+def test_stacked_team_stats_have_no_ambiguous_labels():
+    fe = FeatureEngineer(window_size=5)
+    all_team_stats = {
+        team: _team_stats(size, seed=size).assign(team=team)  # fetcher-style team column
+        for team, size in [('A', 4), ('B', 1)]
+    }
+
+    result = fe.create_rolling_features_all(all_team_stats)
+
+    assert 'team' not in result.columns
+    assert result.sort_values('team').index.tolist() == ['A'] * 4 + ['B']
+    assert result.loc[['B']].sort_values('week').groupby('week').size().tolist() == [1]